@@ -0,0 +1,297 @@
+"""
+Admission control for coupon retrieval.
+Applies per-credential token buckets and concurrency caps, and hands
+out LLM scoring capacity in fixed-size work slots, earliest deadline first.
+Whether a request runs at full quality, reduced or bid-only is decided on
+arrival from the expected wait, so overload degrades answers instead of
+stalling them.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+# Service levels, from most to least expensive
+MODE_FULL = "full"          # LLM-score every coupon
+MODE_REDUCED = "reduced"    # LLM-score only the highest-bid candidates
+MODE_BID_ONLY = "bid_only"  # no LLM work, rank the cached catalog by bid price
+MODE_CACHED = "cached"      # served from a previous (possibly stale) ranking
+
+
+class Overloaded(Exception):
+    """Raised when a request must be shed; retry_after is in whole seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Rate limit exceeded. Try again in {retry_after} seconds.")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate tokens/second up to burst.
+    Tokens may go negative: a cost larger than burst is allowed from a full
+    bucket, and degraded admissions run up debt down to -burst.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self):
+        # Caller holds the controller lock
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost: float) -> bool:
+        """Take cost tokens for full service."""
+        self.refill()
+        if self.tokens >= min(cost, self.burst):
+            self.tokens -= cost
+            return True
+        return False
+
+    def take_debt(self, cost: float) -> bool:
+        """Take cost tokens for degraded service while debt stays under burst."""
+        self.refill()
+        if self.tokens > -self.burst:
+            self.tokens -= cost
+            return True
+        return False
+
+    def retry_after(self, cost: float) -> int:
+        """Whole seconds until cost can be taken for full service."""
+        if self.rate <= 0:
+            return 60
+        return max(1, math.ceil((min(cost, self.burst) - self.tokens) / self.rate))
+
+
+class WorkQueue:
+    """
+    Fixed pool of work slots with a bounded wait queue.
+    A request takes as many slots as its work needs. Waiters are served
+    earliest deadline first; a waiter whose deadline passes leaves the
+    queue without slots. Slot hold times feed an expected-wait estimate.
+    """
+
+    def __init__(self, slots: int, max_waiting: int):
+        self.slots = slots
+        self.max_waiting = max_waiting
+        self.avg_hold = 0.0
+        self._free = slots
+        self._waiting = []
+        self._queued_units = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def depth(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def in_use(self) -> int:
+        return self.slots - self._free
+
+    def expected_wait(self, units: int) -> float:
+        """Estimated seconds before units slots would be granted."""
+        with self._cond:
+            if not self._waiting and self._free >= units:
+                return 0.0
+            backlog = self._queued_units + units - self._free
+            return self.avg_hold * backlog / self.slots
+
+    def acquire(self, units: int, deadline: float) -> bool:
+        """Wait for units slots until deadline (time.monotonic()). Returns False on timeout or full queue."""
+        units = min(units, self.slots)
+        with self._cond:
+            if self._free >= units and not self._waiting:
+                self._free -= units
+                return True
+            if len(self._waiting) >= self.max_waiting:
+                return False
+
+            entry = (deadline, next(self._seq), units)
+            heapq.heappush(self._waiting, entry)
+            self._queued_units += units
+            try:
+                while True:
+                    if self._waiting[0] is entry and self._free >= units:
+                        heapq.heappop(self._waiting)
+                        self._free -= units
+                        return True
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                # Timed out or interrupted: leave the queue
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                self._queued_units -= units
+                self._cond.notify_all()
+
+    def release(self, units: int, held: float):
+        """Return units slots that were held for held seconds."""
+        units = min(units, self.slots)
+        with self._cond:
+            self._free += units
+            self.avg_hold = held if not self.avg_hold else 0.8 * self.avg_hold + 0.2 * held
+            self._cond.notify_all()
+
+
+class Ticket:
+    """Admission grant for one request; release it when the work is done."""
+
+    def __init__(self, controller, tenant: str, mode: str):
+        self.controller = controller
+        self.tenant = tenant
+        self.mode = mode
+        self.units = 0
+        self.acquired_at = None
+        self._released = False
+
+    def schedule(self, work: int, reduced_work: Optional[int] = None,
+                 deadline: Optional[float] = None) -> str:
+        """Reserve scoring slots for work (context, coupon) pairs; returns the final mode."""
+        return self.controller._schedule(self, work, reduced_work, deadline)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    """
+    Decides how much work each request may do.
+
+    admit() charges the tenant's bucket cost tokens (one per context that
+    needs scoring) and enforces its concurrency cap. Up to
+    tenant_concurrency further requests may run past the cap, bid-only:
+
+      in flight at twice the cap                -> shed (Overloaded)
+      tokens cover cost, in flight under cap    -> eligible for MODE_FULL
+      tokens cover cost, in flight at cap       -> MODE_BID_ONLY
+      out of tokens, debt still under burst     -> MODE_BID_ONLY
+      out of tokens, debt exhausted             -> shed (Overloaded)
+
+    Eligible tickets then schedule() their (context, coupon) work. Each
+    slot covers slot_work pairs. On arrival the expected wait plus typical
+    hold time is compared with the request deadline. The request waits for
+    full scoring if that fits, for reduced scoring if only that fits, and
+    otherwise drops straight to MODE_BID_ONLY without waiting.
+
+    Args:
+        rate: Sustained contexts per second allowed per tenant
+        burst: Token bucket capacity per tenant
+        tenant_concurrency: In-flight requests per tenant eligible for LLM scoring
+        slots: Global number of scoring slots
+        slot_work: (context, coupon) pairs covered by one slot
+        max_queue: Maximum requests waiting for slots
+        deadline: Default seconds a request may take when it doesn't set one
+    """
+
+    def __init__(self, rate: float = 5.0, burst: float = 20.0, tenant_concurrency: int = 4,
+                 slots: int = 16, slot_work: int = 50, max_queue: int = 64,
+                 deadline: float = 5.0):
+        self.rate = rate
+        self.burst = burst
+        self.tenant_concurrency = tenant_concurrency
+        self.slot_work = slot_work
+        self.deadline = deadline
+        self.queue = WorkQueue(slots, max_queue)
+
+        self._buckets = {}
+        self._in_flight = defaultdict(int)
+        self._lock = threading.Lock()
+        self._counts = defaultdict(int)
+
+    def admit(self, tenant: str, cost: int = 1) -> Ticket:
+        """Admit a request for tenant. Raises Overloaded when it must be shed."""
+        with self._lock:
+            bucket = self._buckets.get(tenant)
+            if bucket is None:
+                bucket = self._buckets[tenant] = TokenBucket(self.rate, self.burst)
+
+            in_flight = self._in_flight[tenant]
+            if in_flight >= 2 * self.tenant_concurrency:
+                self._counts["shed"] += 1
+                raise Overloaded(1)
+
+            if bucket.take(cost):
+                mode = MODE_FULL if in_flight < self.tenant_concurrency else MODE_BID_ONLY
+            elif bucket.take_debt(cost):
+                mode = MODE_BID_ONLY
+            else:
+                self._counts["shed"] += 1
+                raise Overloaded(bucket.retry_after(cost))
+
+            self._in_flight[tenant] += 1
+            return Ticket(self, tenant, mode)
+
+    def units_for(self, work: int) -> int:
+        return max(1, min(self.queue.slots, math.ceil(work / self.slot_work)))
+
+    def record(self, mode: str):
+        """Count how a request was finally served."""
+        with self._lock:
+            self._counts[mode] += 1
+
+    def stats(self) -> Dict:
+        """Current load and cumulative outcomes for monitoring."""
+        with self._lock:
+            return {
+                "slots_in_use": self.queue.in_use,
+                "queued": self.queue.depth,
+                "served": {mode: self._counts[mode]
+                           for mode in (MODE_FULL, MODE_REDUCED, MODE_BID_ONLY, MODE_CACHED)},
+                "shed": self._counts["shed"]
+            }
+
+    def _schedule(self, ticket: Ticket, work: int, reduced_work: Optional[int],
+                  deadline: Optional[float]) -> str:
+        if ticket.mode != MODE_FULL or ticket.units:
+            return ticket.mode
+
+        now = time.monotonic()
+        deadline = deadline if deadline is not None else now + self.deadline
+        budget = deadline - now
+
+        options = [(MODE_FULL, self.units_for(work))]
+        if reduced_work is not None and reduced_work < work:
+            options.append((MODE_REDUCED, self.units_for(reduced_work)))
+
+        for mode, units in options:
+            if self.queue.expected_wait(units) + self.queue.avg_hold > budget:
+                continue
+            if self.queue.acquire(units, deadline):
+                ticket.mode = mode
+                ticket.units = units
+                ticket.acquired_at = time.monotonic()
+                return mode
+            break
+
+        ticket.mode = MODE_BID_ONLY
+        return ticket.mode
+
+    def _release(self, ticket: Ticket):
+        if ticket.units:
+            self.queue.release(ticket.units, time.monotonic() - ticket.acquired_at)
+        with self._lock:
+            self._in_flight[ticket.tenant] -= 1
+            if not self._in_flight[ticket.tenant]:
+                del self._in_flight[ticket.tenant]
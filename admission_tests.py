@@ -0,0 +1,194 @@
+import threading
+import time
+from unittest.mock import patch
+
+from admission import (AdmissionController, Overloaded, TokenBucket, WorkQueue,
+                       MODE_FULL, MODE_REDUCED, MODE_BID_ONLY)
+
+
+def admit_or_shed(controller, tenant, cost=1):
+    try:
+        ticket = controller.admit(tenant, cost)
+    except Overloaded:
+        return "shed"
+    ticket.release()
+    return ticket.mode
+
+
+def test_token_bucket_refill():
+    with patch("admission.time.monotonic", return_value=100.0):
+        bucket = TokenBucket(rate=2, burst=4)
+        assert all(bucket.take(1) for _ in range(4))
+        assert not bucket.take(1)
+        assert bucket.retry_after(1) == 1
+    with patch("admission.time.monotonic", return_value=101.0):
+        assert bucket.take(1) and bucket.take(1)
+        assert not bucket.take(1)
+    with patch("admission.time.monotonic", return_value=200.0):
+        bucket.refill()
+        assert bucket.tokens == 4
+    print("Token bucket refill test passed")
+
+
+def test_token_bucket_oversized_cost():
+    with patch("admission.time.monotonic", return_value=100.0):
+        bucket = TokenBucket(rate=1, burst=5)
+        assert bucket.take(8)
+        assert bucket.tokens == -3
+        assert not bucket.take(1)
+    print("Oversized cost test passed")
+
+
+def test_noisy_tenant_degrades_then_sheds():
+    controller = AdmissionController(rate=1, burst=2, tenant_concurrency=1)
+    with patch("admission.time.monotonic", return_value=100.0):
+        modes = [admit_or_shed(controller, "noisy") for _ in range(50)]
+        assert modes[:4] == [MODE_FULL, MODE_FULL, MODE_BID_ONLY, MODE_BID_ONLY]
+        assert set(modes[4:]) == {"shed"}
+        # Other tenants are unaffected
+        assert admit_or_shed(controller, "quiet") == MODE_FULL
+    print("Noisy tenant test passed")
+
+
+def test_batch_charged_per_context():
+    controller = AdmissionController(rate=1, burst=10)
+    with patch("admission.time.monotonic", return_value=100.0):
+        assert admit_or_shed(controller, "bot", cost=10) == MODE_FULL
+        assert admit_or_shed(controller, "bot", cost=10) == MODE_BID_ONLY
+        assert admit_or_shed(controller, "bot", cost=1) == "shed"
+    print("Per-context charge test passed")
+
+
+def test_concurrency_cap_degrades_then_sheds():
+    controller = AdmissionController(tenant_concurrency=2)
+    held = [controller.admit("bot") for _ in range(4)]
+    assert [ticket.mode for ticket in held] == [MODE_FULL, MODE_FULL, MODE_BID_ONLY, MODE_BID_ONLY]
+    try:
+        controller.admit("bot")
+        assert False, "expected Overloaded"
+    except Overloaded as e:
+        assert e.retry_after >= 1
+    # Other tenants are unaffected
+    assert admit_or_shed(controller, "other") == MODE_FULL
+    for ticket in held[1:]:
+        ticket.release()
+    assert admit_or_shed(controller, "bot") == MODE_FULL
+    held[0].release()
+    print("Concurrency cap test passed")
+
+
+def test_slots_cover_fixed_work():
+    controller = AdmissionController(slots=4, slot_work=10)
+    assert controller.units_for(1) == 1
+    assert controller.units_for(25) == 3
+    assert controller.units_for(1000) == 4
+
+    ticket = controller.admit("bot")
+    assert ticket.schedule(25) == MODE_FULL
+    assert controller.queue.in_use == 3
+    ticket.release()
+    assert controller.queue.in_use == 0
+    print("Slot work test passed")
+
+
+def test_degrades_on_arrival_without_waiting():
+    controller = AdmissionController(slots=2, slot_work=10, deadline=1.0)
+    controller.queue.avg_hold = 5.0
+    holder = controller.admit("a")
+    holder.schedule(20)
+
+    ticket = controller.admit("b")
+    started = time.monotonic()
+    assert ticket.schedule(20, reduced_work=10) == MODE_BID_ONLY
+    assert time.monotonic() - started < 0.05
+    ticket.release()
+    holder.release()
+    print("Arrival degrade test passed")
+
+
+def test_reduced_when_only_reduced_fits():
+    controller = AdmissionController(slots=4, slot_work=10, deadline=1.0)
+    controller.queue.avg_hold = 0.8
+    holder = controller.admit("a")
+    holder.schedule(30)
+
+    # Full work needs 4 slots (wait 0.6s + 0.8s hold > 1s); reduced fits in the free slot
+    ticket = controller.admit("b")
+    assert ticket.schedule(40, reduced_work=10) == MODE_REDUCED
+    ticket.release()
+    holder.release()
+    print("Reduced mode test passed")
+
+
+def test_work_queue_timeout():
+    queue = WorkQueue(slots=1, max_waiting=4)
+    assert queue.acquire(1, time.monotonic() + 1)
+    started = time.monotonic()
+    assert not queue.acquire(1, time.monotonic() + 0.05)
+    assert time.monotonic() - started < 0.5
+    assert queue.depth == 0
+    queue.release(1, 0.1)
+    print("Work queue timeout test passed")
+
+
+def test_work_queue_leaves_queue_on_error():
+    queue = WorkQueue(slots=1, max_waiting=4)
+    assert queue.acquire(1, time.monotonic() + 1)
+    with patch.object(queue._cond, "wait", side_effect=OverflowError("timeout value is too large")):
+        try:
+            queue.acquire(1, float("inf"))
+            assert False, "expected OverflowError"
+        except OverflowError:
+            pass
+    assert queue.depth == 0
+    assert queue._queued_units == 0
+    queue.release(1, 0.1)
+    assert queue.acquire(1, time.monotonic() + 1)
+    print("Work queue error cleanup test passed")
+
+
+def test_work_queue_full():
+    queue = WorkQueue(slots=1, max_waiting=0)
+    assert queue.acquire(1, time.monotonic() + 1)
+    assert not queue.acquire(1, time.monotonic() + 1)
+    queue.release(1, 0.1)
+    print("Work queue full test passed")
+
+
+def test_work_queue_earliest_deadline_first():
+    queue = WorkQueue(slots=1, max_waiting=4)
+    assert queue.acquire(1, time.monotonic() + 10)
+    order = []
+
+    def waiter(name, deadline):
+        if queue.acquire(1, time.monotonic() + deadline):
+            order.append(name)
+            queue.release(1, 0.0)
+
+    threads = [threading.Thread(target=waiter, args=("late", 5.0)),
+               threading.Thread(target=waiter, args=("early", 2.0))]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    assert queue.depth == 2
+    queue.release(1, 0.0)
+    for thread in threads:
+        thread.join()
+    assert order == ["early", "late"]
+    print("Earliest deadline first test passed")
+
+
+if __name__ == "__main__":
+    test_token_bucket_refill()
+    test_token_bucket_oversized_cost()
+    test_noisy_tenant_degrades_then_sheds()
+    test_batch_charged_per_context()
+    test_concurrency_cap_degrades_then_sheds()
+    test_slots_cover_fixed_work()
+    test_degrades_on_arrival_without_waiting()
+    test_reduced_when_only_reduced_fits()
+    test_work_queue_timeout()
+    test_work_queue_leaves_queue_on_error()
+    test_work_queue_full()
+    test_work_queue_earliest_deadline_first()
+    print("All admission tests passed")
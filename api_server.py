@@ -5,13 +5,20 @@ Uses S3 for persistent storage.
 """
 
 import json
+import math
+import re
 import uuid
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from utils import auth_req
 from llm import generate_completion
 from s3_storage import S3Storage
+from response_cache import ResponseCache
+from admission import (AdmissionController, Overloaded,
+                       MODE_FULL, MODE_REDUCED, MODE_BID_ONLY, MODE_CACHED)
 import config
 
 # Initialize
@@ -19,6 +26,43 @@ storage = S3Storage()
 app = Flask(__name__)
 CORS(app)
 
+MAX_BATCH_SIZE = getattr(config, "MAX_BATCH_SIZE", 50)
+SCORING_PACK_SIZE = getattr(config, "SCORING_PACK_SIZE", 8)
+PACKED_SCORE_LINE = re.compile(r"^\s*(\d+)\s*[:.)-]\s*(\d*\.?\d+)")
+
+# Shared by all requests so concurrent batches can't multiply LLM concurrency
+scoring_executor = ThreadPoolExecutor(max_workers=getattr(config, "SCORING_WORKERS", 8))
+
+# Rankings are cached in full (MAX_N_COUPONS, with images) and trimmed per request
+response_cache = ResponseCache(
+    max_distance=getattr(config, "RESPONSE_CACHE_MAX_DISTANCE", 3),
+    min_jaccard=getattr(config, "RESPONSE_CACHE_MIN_JACCARD", 0.9),
+    max_entries=getattr(config, "RESPONSE_CACHE_SIZE", 10000),
+    ttl=getattr(config, "RESPONSE_CACHE_TTL", 300),
+    max_stale=getattr(config, "RESPONSE_CACHE_MAX_STALE", 3600)
+)
+
+admission = AdmissionController(
+    rate=getattr(config, "ADMISSION_RATE", 5.0),
+    burst=getattr(config, "ADMISSION_BURST", 20),
+    tenant_concurrency=getattr(config, "ADMISSION_TENANT_CONCURRENCY", 4),
+    slots=getattr(config, "ADMISSION_SLOTS", 16),
+    slot_work=getattr(config, "ADMISSION_SLOT_WORK", 50),
+    max_queue=getattr(config, "ADMISSION_QUEUE_SIZE", 64),
+    deadline=getattr(config, "ADMISSION_DEADLINE", 5.0)
+)
+REDUCED_CANDIDATES = getattr(config, "REDUCED_CANDIDATES", 10)
+
+def error_response(result):
+    """Map an error result to its HTTP response."""
+    if result["error"] == "Authentication failed":
+        return jsonify(result), 401
+    if "retry_after" in result:
+        response = jsonify(result)
+        response.headers["Retry-After"] = str(result["retry_after"])
+        return response, 429
+    return jsonify(result), 400
+
 @app.route("/GET_COUPONS", methods=['POST'])
 def get_coupons_route():
     """Endpoint for chatbots to retrieve contextually relevant coupons."""
@@ -29,7 +73,22 @@ def get_coupons_route():
         
         result = get_coupons(req)
         if "error" in result:
-            return jsonify(result), 401 if result["error"] == "Authentication failed" else 400
+            return error_response(result)
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+@app.route("/GET_COUPONS_BATCH", methods=['POST'])
+def get_coupons_batch_route():
+    """Endpoint for chatbots to retrieve coupons for many contexts in one call."""
+    try:
+        req = request.get_json()
+        if not req:
+            return jsonify({"error": "Invalid JSON"}), 400
+        
+        result = get_coupons_batch(req)
+        if "error" in result:
+            return error_response(result)
         return jsonify(result), 200
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
@@ -44,7 +103,7 @@ def make_coupons_route():
         
         result = make_coupons(req)
         if "error" in result:
-            return jsonify(result), 401 if result["error"] == "Authentication failed" else 400
+            return error_response(result)
         return jsonify(result), 201
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
@@ -85,12 +144,15 @@ def make_coupons(req):
             "timestamp": int(time.time())
         }
         
-        storage.save_coupon(coupon_id, coupon_data)
+        storage.save_coupon(coupon_id, coupon_data, touch=False)
         coupon_ids.append(coupon_id)
     
     if not coupon_ids:
         return {"error": "No valid coupons to create"}
     
+    # One catalog generation bump and marker write for the whole upload
+    storage.touch_catalog()
+    
     return {
         "status": "Coupons published successfully",
         "coupon_ids": coupon_ids
@@ -101,34 +163,207 @@ def get_coupons(req):
     if not auth_req(req):
         return {"error": "Authentication failed"}
     
+    context, n_coupons, get_images, error = parse_context_request(req)
+    if error:
+        return {"error": error}
+    
+    # Read before the catalog so a write landing mid-scoring can't be masked
+    generation = storage.current_catalog_generation()
+    cached = response_cache.get(context, generation)
+    if cached is not None:
+        return {"coupons": trim_ranking(cached, n_coupons, get_images)}
+    
+    rankings, mode, error = admit_and_rank(req, [context], generation)
+    if error:
+        return error
+    
+    return with_mode({"coupons": trim_ranking(rankings[context], n_coupons, get_images)}, mode)
+
+def get_coupons_batch(req):
+    """
+    Retrieve and rank coupons for many contexts under one chatbot credential.
+    Authentication and the catalog read happen once for the whole batch,
+    each distinct (context, coupon) pair is scored only once, and admission
+    charges the tenant per context that missed the response cache.
+    """
+    if not auth_req(req):
+        return {"error": "Authentication failed"}
+    
+    items = req.get('contexts', [])
+    if not items or not isinstance(items, list):
+        return {"error": "No contexts provided"}
+    
+    if len(items) > MAX_BATCH_SIZE:
+        return {"error": f"Too many contexts (max {MAX_BATCH_SIZE})"}
+    
+    # Per-item values fall back to the batch-level N_COUPONS / GET_IMAGES
+    parsed = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"context": item}
+        if not isinstance(item, dict):
+            parsed.append((None, 0, False, "Invalid context entry"))
+            continue
+        merged = {
+            "N_COUPONS": req.get('N_COUPONS', config.DEFAULT_N_COUPONS),
+            "GET_IMAGES": req.get('GET_IMAGES', False),
+        }
+        merged.update(item)
+        parsed.append(parse_context_request(merged))
+    
+    rankings = {}
+    generation = storage.current_catalog_generation()
+    for context, _, _, error in parsed:
+        if not error and context not in rankings:
+            rankings[context] = response_cache.get(context, generation)
+    
+    mode = MODE_FULL
+    misses = [context for context, ranking in rankings.items() if ranking is None]
+    if misses:
+        ranked, mode, error = admit_and_rank(req, misses, generation)
+        if error:
+            return error
+        rankings.update(ranked)
+    
+    results = []
+    for context, n_coupons, get_images, error in parsed:
+        if error:
+            results.append({"error": error})
+            continue
+        results.append({"coupons": trim_ranking(rankings[context], n_coupons, get_images)})
+    
+    return with_mode({"results": results}, mode)
+
+def admit_and_rank(req, contexts, generation):
+    """
+    Rank contexts that missed the response cache under admission control.
+    Degraded requests prefer a stale cached ranking, then bid-only ranking
+    of the in-memory catalog; a shed request is answered from stale cache
+    if every context has an entry, otherwise with a retry_after error.
+    Returns (rankings, mode, error).
+    """
+    try:
+        ticket = admission.admit(request_tenant(req), cost=len(contexts))
+    except Overloaded as e:
+        stale = stale_rankings(contexts, generation)
+        if stale is None:
+            return None, None, {"error": str(e), "retry_after": e.retry_after}
+        admission.record(MODE_CACHED)
+        return stale, MODE_CACHED, None
+    
+    with ticket:
+        try:
+            all_coupons = None
+            if ticket.mode == MODE_FULL:
+                all_coupons = storage.get_catalog()
+                if all_coupons:
+                    reduced = min(len(all_coupons), max(REDUCED_CANDIDATES, config.MAX_N_COUPONS))
+                    ticket.schedule(len(contexts) * len(all_coupons), len(contexts) * reduced,
+                                    request_deadline(req))
+            
+            if ticket.mode == MODE_BID_ONLY:
+                stale = stale_rankings(contexts, generation)
+                if stale is not None:
+                    admission.record(MODE_CACHED)
+                    return stale, MODE_CACHED, None
+                all_coupons = storage.get_catalog(allow_stale=True)
+        except Exception as e:
+            return None, None, {"error": f"Storage error: {str(e)}"}
+        
+        admission.record(ticket.mode)
+        return rank_contexts(contexts, all_coupons, ticket.mode, generation), ticket.mode, None
+
+def stale_rankings(contexts, generation):
+    """Cached rankings for every context, ignoring freshness, or None if any is missing."""
+    rankings = {}
+    for context in contexts:
+        ranking = response_cache.get(context, generation, allow_stale=True)
+        if ranking is None:
+            return None
+        rankings[context] = ranking
+    return rankings
+
+def request_deadline(req):
+    """
+    Optional client deadline (DEADLINE_MS from now) as a time.monotonic() value.
+    Clamped to ADMISSION_DEADLINE so no tenant can jump the scoring queue or
+    wait longer than the server allows; non-finite values are ignored.
+    """
+    try:
+        deadline_ms = float(req.get('DEADLINE_MS'))
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(deadline_ms):
+        return None
+    return time.monotonic() + min(max(0.0, deadline_ms) / 1000, admission.deadline)
+
+def request_tenant(req):
+    """Credential that admission limits are keyed on."""
+    return req.get("chatbot_id") or req.get("account_id")
+
+def with_mode(result, mode):
+    """Flag a response that was served at a degraded service level."""
+    if mode != MODE_FULL:
+        result["degraded"] = mode
+    return result
+
+def rank_contexts(contexts, all_coupons, mode, generation):
+    """
+    Rank the full catalog for each context at the given admission mode.
+    Only full-quality rankings are written to the response cache, tagged with
+    the catalog generation read before all_coupons was fetched.
+    """
+    candidates = all_coupons
+    if mode == MODE_REDUCED:
+        candidates = sorted(all_coupons, key=lambda c: c['bid_price'], reverse=True)
+        candidates = candidates[:max(REDUCED_CANDIDATES, config.MAX_N_COUPONS)]
+    
+    # Bid-only skips the LLM; the neutral 0.5 score (same as an unparseable
+    # LLM reply) leaves bid price to decide the order
+    pair_scores = {}
+    if mode != MODE_BID_ONLY:
+        pair_scores = score_pairs({(context, coupon['text_body'])
+                                   for context in contexts for coupon in candidates})
+    
+    rankings = {}
+    for context in contexts:
+        scores = {coupon['coupon_id']: pair_scores.get((context, coupon['text_body']), 0.5)
+                  for coupon in candidates}
+        rankings[context] = rank_coupons(candidates, scores, config.MAX_N_COUPONS, True)
+        if mode == MODE_FULL and candidates:
+            response_cache.set(context, generation, rankings[context])
+    return rankings
+
+def parse_context_request(req):
+    """
+    Validate and normalize the context fields of a coupon request.
+    Returns (context, n_coupons, get_images, error).
+    """
     context = req.get('context', '')
     n_coupons = req.get('N_COUPONS', config.DEFAULT_N_COUPONS)
     get_images = req.get('GET_IMAGES', False)
     
-    if not context:
-        return {"error": "Context is required"}
+    if not context or not isinstance(context, str):
+        return None, 0, False, "Context is required"
     
     if len(context) > config.MAX_CONTEXT_LENGTH:
         context = context[:config.MAX_CONTEXT_LENGTH]
     
-    n_coupons = max(1, min(int(n_coupons), config.MAX_N_COUPONS))
-    
     try:
-        all_coupons = storage.get_all_coupons()
-    except Exception as e:
-        return {"error": f"Storage error: {str(e)}"}
+        n_coupons = max(1, min(int(n_coupons), config.MAX_N_COUPONS))
+    except (TypeError, ValueError):
+        return None, 0, False, "N_COUPONS must be a number"
     
-    if not all_coupons:
-        return {"coupons": []}
-    
-    # Score and rank coupons
+    return context, n_coupons, bool(get_images), None
+
+def rank_coupons(all_coupons, scores, n_coupons, get_images):
+    """Rank coupons by score then bid price, given scores keyed by coupon_id."""
     scored_coupons = []
     for coupon in all_coupons:
-        score = score_coupon(context, coupon['text_body'])
         coupon_result = {
             "coupon_id": coupon['coupon_id'],
             "text": coupon['text_body'],
-            "score": score,
+            "score": scores[coupon['coupon_id']],
             "bid_price": coupon['bid_price']
         }
         
@@ -143,7 +378,68 @@ def get_coupons(req):
         reverse=True
     )
     
-    return {"coupons": sorted_coupons[:n_coupons]}
+    return sorted_coupons[:n_coupons]
+
+def trim_ranking(ranking, n_coupons, get_images):
+    """Cut a full cached ranking down to what a request asked for."""
+    coupons = [dict(coupon) for coupon in ranking[:n_coupons]]
+    if not get_images:
+        for coupon in coupons:
+            coupon.pop('image_url', None)
+    return coupons
+
+def score_pairs(pairs):
+    """
+    Score distinct (context, coupon_text) pairs on the shared scoring pool,
+    packing up to SCORING_PACK_SIZE coupons of the same context per prompt.
+    """
+    texts_by_context = defaultdict(set)
+    for context, coupon_text in pairs:
+        texts_by_context[context].add(coupon_text)
+    
+    chunks = []
+    for context, texts in texts_by_context.items():
+        texts = sorted(texts)
+        for i in range(0, len(texts), SCORING_PACK_SIZE):
+            chunks.append((context, texts[i:i + SCORING_PACK_SIZE]))
+    
+    futures = [scoring_executor.submit(score_coupons, context, texts) for context, texts in chunks]
+    
+    scores = {}
+    for (context, texts), future in zip(chunks, futures):
+        for coupon_text, score in zip(texts, future.result()):
+            scores[(context, coupon_text)] = score
+    return scores
+
+def score_coupons(context, coupon_texts):
+    """Score several coupons against one context with a single LLM call."""
+    if len(coupon_texts) == 1:
+        return [score_coupon(context, coupon_texts[0])]
+    
+    listing = "\n".join(f"{i}. {' '.join(text.split())}" for i, text in enumerate(coupon_texts, 1))
+    prompt = f"""Rate the relevance of each coupon to the user's context on a scale from 0 to 1.
+Return one line per coupon in the form "<coupon number>: <score>" and nothing else.
+
+User Context: {context}
+Coupons:
+{listing}
+
+Scores:"""
+    
+    # Coupons the reply doesn't cover keep the neutral 0.5
+    scores = [0.5] * len(coupon_texts)
+    try:
+        response = generate_completion(prompt, max_tokens=8 * len(coupon_texts))
+        for line in response.splitlines():
+            match = PACKED_SCORE_LINE.match(line)
+            if not match:
+                continue
+            index = int(match.group(1)) - 1
+            if 0 <= index < len(scores):
+                scores[index] = max(0.0, min(1.0, float(match.group(2))))
+    except (ValueError, AttributeError):
+        pass
+    return scores
 
 def score_coupon(context, coupon_text):
     """Score a coupon's relevance to the given context using LLM."""
@@ -165,7 +461,12 @@ Score:"""
 @app.route("/health", methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({"status": "healthy", "timestamp": int(time.time())}), 200
+    return jsonify({
+        "status": "healthy",
+        "timestamp": int(time.time()),
+        "response_cache": response_cache.stats(),
+        "admission": admission.stats()
+    }), 200
 
 if __name__ == "__main__":
     app.run(debug=config.DEBUG_MODE, host=config.SERVER_HOST, port=config.SERVER_PORT)
\ No newline at end of file
@@ -0,0 +1,357 @@
+"""
+Client library for chatbots calling the Beavis API.
+Provides a pooled sync client, an asyncio client that coalesces concurrent
+calls into GET_COUPONS_BATCH requests, retries with jittered backoff and a
+small TTL cache keyed on the normalized context.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "http://localhost:8050"
+MAX_CONTEXT_LENGTH = 2000
+# Server limit on contexts per GET_COUPONS_BATCH call
+MAX_BATCH_SIZE = 50
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CouponClientError(Exception):
+    """Raised when the Beavis API cannot be reached or rejects a request."""
+
+
+def normalize_context(context: str) -> str:
+    """Normalize a context for cache lookups: trim, collapse whitespace, lowercase."""
+    return " ".join(context[:MAX_CONTEXT_LENGTH].split()).lower()
+
+
+def copy_coupons(coupons: List[Dict]) -> List[Dict]:
+    """Copy a coupon list so callers can't mutate cached results."""
+    return [dict(coupon) for coupon in coupons]
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CouponClient:
+    """
+    Synchronous client with a persistent connection pool.
+
+    Args:
+        chatbot_id: Chatbot identifier
+        token: Chatbot authentication token
+        base_url: Server root, e.g. http://localhost:8050
+        timeout: Overall budget in seconds for one call, retries included
+        max_retries: Retries after the first attempt on transient failures
+        backoff: Base delay in seconds for exponential backoff with full jitter
+        max_retry_after: Longest server Retry-After honored; longer ones end the call
+        min_attempt: Don't retry unless at least this many seconds of budget remain
+        cache_ttl: Seconds to keep results client-side (0 disables the cache)
+        pool_size: Maximum pooled connections to the server
+        max_batch_size: Contexts sent per GET_COUPONS_BATCH request
+    """
+
+    def __init__(
+        self,
+        chatbot_id: str,
+        token: str,
+        base_url: str = DEFAULT_BASE_URL,
+        timeout: float = 10.0,
+        max_retries: int = 2,
+        backoff: float = 0.2,
+        max_retry_after: float = 2.0,
+        min_attempt: float = 0.5,
+        cache_ttl: float = 30.0,
+        cache_size: int = 1024,
+        pool_size: int = 10,
+        max_batch_size: int = MAX_BATCH_SIZE
+    ):
+        self.chatbot_id = chatbot_id
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        self.min_attempt = min_attempt
+        self.max_batch_size = max(1, max_batch_size)
+        self.cache = TTLCache(cache_ttl, cache_size)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def cache_key(self, context: str, n_coupons: int, get_images: bool):
+        return (normalize_context(context), int(n_coupons), bool(get_images))
+
+    def cached(self, context: str, n_coupons: int, get_images: bool) -> Optional[List[Dict]]:
+        """Return a copy of the cached result for context, or None."""
+        coupons = self.cache.get(self.cache_key(context, n_coupons, get_images))
+        return copy_coupons(coupons) if coupons is not None else None
+
+    def match(self, context: str, n_coupons: int = 5, get_images: bool = True) -> List[Dict]:
+        """Retrieve ranked coupons for one context. Raises CouponClientError on failure."""
+        cached = self.cached(context, n_coupons, get_images)
+        if cached is not None:
+            return cached
+
+        data = self.post("/GET_COUPONS", {
+            "context": context[:MAX_CONTEXT_LENGTH],
+            "N_COUPONS": n_coupons,
+            "GET_IMAGES": get_images
+        })
+        coupons = data.get("coupons", [])
+        self.cache.set(self.cache_key(context, n_coupons, get_images), copy_coupons(coupons))
+        return coupons
+
+    def match_many(self, contexts: List[str], n_coupons: int = 5, get_images: bool = True,
+                   return_exceptions: bool = False) -> List:
+        """
+        Retrieve ranked coupons for several contexts with GET_COUPONS_BATCH,
+        max_batch_size contexts per request. Cached contexts are served locally. An entry the server rejects raises
+        CouponClientError, as match() would; with return_exceptions the error
+        is returned in that entry's place instead.
+        """
+        keys = [self.cache_key(context, n_coupons, get_images) for context in contexts]
+        results = [self.cached(context, n_coupons, get_images) for context in contexts]
+
+        # Send each uncached normalized context once
+        pending = OrderedDict()
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                pending.setdefault(key, []).append(i)
+
+        pending = list(pending.items())
+        for start in range(0, len(pending), self.max_batch_size):
+            chunk = pending[start:start + self.max_batch_size]
+            entries = [contexts[indices[0]][:MAX_CONTEXT_LENGTH] for _, indices in chunk]
+            data = self.post("/GET_COUPONS_BATCH", {
+                "contexts": entries,
+                "N_COUPONS": n_coupons,
+                "GET_IMAGES": get_images
+            })
+            server_results = data.get("results", [])
+            if len(server_results) != len(entries):
+                raise CouponClientError("API error: batch response does not match request")
+
+            for (key, indices), result in zip(chunk, server_results):
+                if "error" in result:
+                    outcome = CouponClientError(f"API error: {result['error']}")
+                else:
+                    outcome = result.get("coupons", [])
+                    self.cache.set(key, copy_coupons(outcome))
+                for i in indices:
+                    results[i] = outcome if isinstance(outcome, Exception) else copy_coupons(outcome)
+
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
+
+    def post(self, path: str, payload: Dict) -> Dict:
+        """
+        POST an authenticated payload within the timeout budget, retrying
+        transient failures with jittered backoff while enough budget remains.
+        """
+        body = dict(payload, chatbot_id=self.chatbot_id, token=self.token)
+        url = f"{self.base_url}{path}"
+        deadline = time.monotonic() + self.timeout
+
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            try:
+                response = self.session.post(url, json=body, timeout=max(remaining, 0.001))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                delay = self.retry_delay(attempt)
+                if not self.can_retry(attempt, deadline, delay):
+                    raise CouponClientError(f"API request error: {e}") from e
+                time.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                delay = self.retry_delay(attempt, response.headers.get("Retry-After"))
+                if self.can_retry(attempt, deadline, delay):
+                    time.sleep(delay)
+                    continue
+
+            try:
+                data = response.json()
+            except ValueError:
+                data = {}
+            if response.status_code >= 400:
+                message = data.get("error") or response.reason
+                raise CouponClientError(f"API error {response.status_code}: {message}")
+            return data
+
+        raise CouponClientError("API request error: retries exhausted")
+
+    def can_retry(self, attempt: int, deadline: float, delay: Optional[float]) -> bool:
+        """Retry only with attempts left and enough budget for a useful attempt after the delay."""
+        if delay is None or attempt >= self.max_retries:
+            return False
+        return deadline - time.monotonic() - delay >= self.min_attempt
+
+    def retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> Optional[float]:
+        """
+        Full-jitter exponential backoff, never shorter than the server's
+        Retry-After. Returns None when Retry-After exceeds max_retry_after.
+        """
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        if retry_after:
+            try:
+                retry_after = float(retry_after)
+            except ValueError:
+                return delay
+            if retry_after > self.max_retry_after:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+
+class AsyncCouponClient:
+    """
+    asyncio client built on CouponClient's pooled session.
+
+    Calls to match() made within batch_window seconds of each other are
+    coalesced into a single GET_COUPONS_BATCH request. Set batch_window to 0
+    to send each call on its own. Blocking I/O runs in the default executor.
+    """
+
+    def __init__(self, chatbot_id: str, token: str, batch_window: float = 0.005,
+                 max_batch_size: int = MAX_BATCH_SIZE, **kwargs):
+        self.client = CouponClient(chatbot_id, token, max_batch_size=max_batch_size, **kwargs)
+        self.batch_window = batch_window
+        self.max_batch_size = self.client.max_batch_size
+        self._pending = {}
+        self._flush_handles = {}
+        self._tasks = set()
+
+    async def close(self):
+        await self.flush()
+        self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def match(self, context: str, n_coupons: int = 5, get_images: bool = True) -> List[Dict]:
+        """Retrieve ranked coupons for one context. Raises CouponClientError on failure."""
+        cached = self.client.cached(context, n_coupons, get_images)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        if self.batch_window <= 0:
+            return await loop.run_in_executor(None, self.client.match, context, n_coupons, get_images)
+
+        # Batch calls sharing the same N_COUPONS / GET_IMAGES options
+        options = (n_coupons, get_images)
+        future = loop.create_future()
+        batch = self._pending.setdefault(options, [])
+        batch.append((context, future))
+
+        if len(batch) >= self.max_batch_size:
+            self._flush_now(options)
+        elif options not in self._flush_handles:
+            self._flush_handles[options] = loop.call_later(self.batch_window, self._flush_now, options)
+
+        return await future
+
+    async def match_many(self, contexts: List[str], n_coupons: int = 5, get_images: bool = True,
+                         return_exceptions: bool = False) -> List:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self.client.match_many, contexts, n_coupons, get_images, return_exceptions)
+
+    async def flush(self):
+        """Send any pending batched calls immediately and wait for them."""
+        for options in list(self._pending):
+            self._flush_now(options)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _flush_now(self, options):
+        handle = self._flush_handles.pop(options, None)
+        if handle:
+            handle.cancel()
+        batch = self._pending.pop(options, [])
+        if batch:
+            # Hold a reference so the task can't be garbage-collected mid-flight
+            task = asyncio.ensure_future(self._send_batch(batch, *options))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send_batch(self, batch, n_coupons, get_images):
+        loop = asyncio.get_running_loop()
+        contexts = [context for context, _ in batch]
+        try:
+            if len(contexts) == 1:
+                results = [await loop.run_in_executor(
+                    None, self.client.match, contexts[0], n_coupons, get_images)]
+            else:
+                results = await loop.run_in_executor(
+                    None, self.client.match_many, contexts, n_coupons, get_images, True)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,145 @@
+import asyncio
+from unittest.mock import patch
+
+import requests
+
+from client import AsyncCouponClient, CouponClient, CouponClientError, TTLCache
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, data=None, headers=None):
+        self.status_code = status_code
+        self.data = data or {}
+        self.headers = headers or {}
+        self.reason = "error"
+
+    def json(self):
+        return self.data
+
+
+def batch_reply(path, payload):
+    """Fake server: echoes each context back as a single coupon, rejects 'bad'."""
+    if path == "/GET_COUPONS":
+        return {"coupons": [{"text": payload["context"], "image_url": "x"}]}
+    return {"results": [{"error": "Context is required"} if context == "bad"
+                        else {"coupons": [{"text": context}]}
+                        for context in payload["contexts"]]}
+
+
+def test_ttl_cache_expiry():
+    cache = TTLCache(ttl=10)
+    with patch("client.time.monotonic", return_value=100.0):
+        cache.set("k", [1])
+        assert cache.get("k") == [1]
+    with patch("client.time.monotonic", return_value=111.0):
+        assert cache.get("k") is None
+    print("TTL expiry test passed")
+
+
+def test_ttl_cache_lru_eviction():
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    print("LRU eviction test passed")
+
+
+def test_match_caches_copies():
+    client = CouponClient("bot", "token")
+    with patch.object(client, "post", side_effect=batch_reply) as post:
+        first = client.match("Hello  World")
+        first[0].pop("image_url")
+        second = client.match("hello world")
+    assert post.call_count == 1
+    assert second[0]["image_url"] == "x"
+    print("Cached copy test passed")
+
+
+def test_match_many_entry_errors():
+    client = CouponClient("bot", "token")
+    with patch.object(client, "post", side_effect=batch_reply):
+        try:
+            client.match_many(["good", "bad"])
+            assert False, "expected CouponClientError"
+        except CouponClientError:
+            pass
+        results = client.match_many(["good", "bad"], return_exceptions=True)
+    assert results[0] == [{"text": "good"}]
+    assert isinstance(results[1], CouponClientError)
+    print("Batch entry error test passed")
+
+
+def test_match_many_chunks_to_batch_limit():
+    client = CouponClient("bot", "token", max_batch_size=2)
+    contexts = ["a", "b", "c", "A", "d", "e"]
+    with patch.object(client, "post", side_effect=batch_reply) as post:
+        results = client.match_many(contexts)
+    assert [call.args[1]["contexts"] for call in post.call_args_list] == [["a", "b"], ["c", "d"], ["e"]]
+    assert results == [[{"text": context}] for context in ["a", "b", "c", "a", "d", "e"]]
+    print("Batch chunking test passed")
+
+
+def test_post_respects_budget():
+    client = CouponClient("bot", "token", timeout=0.3, max_retries=5, min_attempt=0.5)
+    with patch.object(client.session, "post", side_effect=requests.ConnectionError("down")) as post:
+        try:
+            client.match("ctx")
+            assert False, "expected CouponClientError"
+        except CouponClientError:
+            pass
+    assert post.call_count == 1
+    print("Retry budget test passed")
+
+
+def test_post_caps_retry_after():
+    client = CouponClient("bot", "token", max_retry_after=2.0)
+    reply = FakeResponse(429, {"error": "Rate limit exceeded"}, {"Retry-After": "30"})
+    with patch.object(client.session, "post", return_value=reply) as post, \
+         patch("client.time.sleep") as sleep:
+        try:
+            client.match("ctx")
+            assert False, "expected CouponClientError"
+        except CouponClientError as e:
+            assert "429" in str(e)
+    assert post.call_count == 1
+    sleep.assert_not_called()
+    print("Retry-After cap test passed")
+
+
+def test_post_retries_transient_errors():
+    client = CouponClient("bot", "token", backoff=0.0)
+    replies = [FakeResponse(503), FakeResponse(200, {"coupons": [{"text": "ok"}]})]
+    with patch.object(client.session, "post", side_effect=replies) as post:
+        assert client.match("ctx") == [{"text": "ok"}]
+    assert post.call_count == 2
+    print("Transient retry test passed")
+
+
+def test_async_coalesces_calls():
+    async def run(client):
+        return await asyncio.gather(*[client.match(f"q{i}") for i in range(5)], client.match("bad"),
+                                    return_exceptions=True)
+
+    client = AsyncCouponClient("bot", "token", batch_window=0.01)
+    with patch.object(client.client, "post", side_effect=batch_reply) as post:
+        results = asyncio.run(run(client))
+    assert [call.args[0] for call in post.call_args_list] == ["/GET_COUPONS_BATCH"]
+    assert results[:5] == [[{"text": f"q{i}"}] for i in range(5)]
+    assert isinstance(results[5], CouponClientError)
+    print("Async coalescing test passed")
+
+
+if __name__ == "__main__":
+    test_ttl_cache_expiry()
+    test_ttl_cache_lru_eviction()
+    test_match_caches_copies()
+    test_match_many_entry_errors()
+    test_match_many_chunks_to_batch_limit()
+    test_post_respects_budget()
+    test_post_caps_retry_after()
+    test_post_retries_transient_errors()
+    test_async_coalesces_calls()
+    print("All client tests passed")
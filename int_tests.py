@@ -52,7 +52,122 @@ def test_get_coupons():
         assert len(data["coupons"]) == 2
         print("GET_COUPONS test passed")
 
+def test_get_coupons_batch():
+    import api_server
+    from admission import AdmissionController
+    from response_cache import ResponseCache
+    
+    catalog = [
+        {"coupon_id": "1", "account_id": "business_123", "text_body": "50% off on all clothing!",
+         "bid_price": 0.7, "timestamp": 1630000000},
+        {"coupon_id": "2", "account_id": "business_456", "text_body": "Discounts on electronics.",
+         "bid_price": 0.3, "timestamp": 1630000001}
+    ]
+    scored = []
+    
+    def fake_score(context, coupon_texts):
+        scored.extend((context, text) for text in coupon_texts)
+        return [0.9 if ("clothing" in context) == ("clothing" in text) else 0.1
+                for text in coupon_texts]
+    
+    payload = {
+        "chatbot_id": "chatbot_456",
+        "token": "valid_token",
+        "N_COUPONS": 2,
+        "contexts": [
+            "Looking for discounts on clothing",
+            {"context": "Need a new laptop", "N_COUPONS": 1},
+            "Looking for discounts on clothing",
+            {"context": ""}
+        ]
+    }
+    with patch('api_server.auth_req', return_value=True), \
+         patch.object(api_server.storage, 'get_catalog', return_value=catalog), \
+         patch.object(api_server.storage, 'current_catalog_generation', return_value=0), \
+         patch('api_server.score_coupons', side_effect=fake_score), \
+         patch('api_server.response_cache', ResponseCache()), \
+         patch('api_server.admission', AdmissionController()):
+        data = api_server.get_coupons_batch(payload)
+    
+    assert "error" not in data
+    # Two distinct contexts x two coupons, each pair scored exactly once
+    assert sorted(scored) == sorted(set(scored))
+    assert len(scored) == 4
+    
+    results = data["results"]
+    assert len(results) == 4
+    assert [c["coupon_id"] for c in results[0]["coupons"]] == ["1", "2"]
+    assert [c["coupon_id"] for c in results[1]["coupons"]] == ["2"]
+    assert results[2] == results[0]
+    assert results[3]["error"] == "Context is required"
+    print("GET_COUPONS_BATCH test passed")
+
+def test_get_coupons_overload():
+    import api_server
+    from admission import AdmissionController
+    from response_cache import ResponseCache
+    
+    cache = ResponseCache()
+    cache.set("Looking for discounts on clothing", 0, [
+        {"coupon_id": "1", "text": "50% off on all clothing!", "score": 0.9, "bid_price": 0.7}
+    ])
+    payload = {
+        "chatbot_id": "chatbot_456",
+        "token": "valid_token",
+        "context": "Looking for discounts on clothing",
+        "N_COUPONS": 1
+    }
+    # A zero concurrency cap leaves no bid-only allowance either, so every request is shed
+    with patch('api_server.auth_req', return_value=True), \
+         patch.object(api_server.storage, 'current_catalog_generation', return_value=1), \
+         patch.object(api_server.storage, 'get_catalog') as get_catalog, \
+         patch('api_server.response_cache', cache), \
+         patch('api_server.admission', AdmissionController(tenant_concurrency=0)):
+        data = api_server.get_coupons(payload)
+        shed = api_server.get_coupons(dict(payload, context="Need a new laptop"))
+    
+    # Shed requests are answered from the stale ranking without touching storage
+    assert data["degraded"] == "cached"
+    assert [c["coupon_id"] for c in data["coupons"]] == ["1"]
+    get_catalog.assert_not_called()
+    assert shed["retry_after"] >= 1
+    print("GET_COUPONS overload test passed")
+
+def test_deadline_ms_is_clamped():
+    import time
+    import api_server
+    
+    now = time.monotonic()
+    limit = api_server.admission.deadline
+    assert api_server.request_deadline({"DEADLINE_MS": 10 ** 9}) <= time.monotonic() + limit
+    # Non-finite values fall back to the server default
+    for value in ["1e400", "Infinity", "NaN"]:
+        assert api_server.request_deadline({"DEADLINE_MS": value}) is None
+    assert api_server.request_deadline({"DEADLINE_MS": -5}) >= now
+    assert api_server.request_deadline({}) is None
+    print("DEADLINE_MS clamp test passed")
+
+def test_catalog_keeps_copy_on_failure():
+    from botocore.exceptions import ClientError
+    from s3_storage import S3Storage
+    
+    storage = S3Storage()
+    catalog = [{"coupon_id": "1", "text_body": "50% off on all clothing!", "bid_price": 0.7}]
+    throttled = ClientError({"Error": {"Code": "SlowDown"}}, "ListObjectsV2")
+    with patch.object(storage, 'current_catalog_generation', side_effect=[0, 1, 1]), \
+         patch.object(storage, '_list_coupons', side_effect=[catalog, throttled, catalog]) as list_coupons:
+        assert storage.get_catalog() == catalog
+        # A failed re-read serves the previous copy and isn't cached
+        assert storage.get_catalog() == catalog
+        assert storage.get_catalog() == catalog
+    assert list_coupons.call_count == 3
+    print("Catalog failure fallback test passed")
+
 if __name__ == "__main__":
     test_make_coupons()
     test_get_coupons()
+    test_get_coupons_batch()
+    test_get_coupons_overload()
+    test_deadline_ms_is_clamped()
+    test_catalog_keeps_copy_on_failure()
     print("All integration tests passed")
\ No newline at end of file
@@ -7,12 +7,13 @@ import requests
 import json
 import config
 
-def generate_completion(prompt: str) -> str:
+def generate_completion(prompt: str, max_tokens: int = 10) -> str:
     """
     Generate a completion using the configured LLM provider.
     
     Args:
         prompt: The prompt to send to the LLM
+        max_tokens: Maximum tokens to generate
         
     Returns:
         String response from the LLM
@@ -20,16 +21,16 @@ def generate_completion(prompt: str) -> str:
     provider = config.LLM_PROVIDER.lower()
     
     if provider == "anthropic":
-        return generate_anthropic(prompt)
+        return generate_anthropic(prompt, max_tokens)
     elif provider == "groq":
-        return generate_groq(prompt)
+        return generate_groq(prompt, max_tokens)
     elif provider == "ollama":
-        return generate_ollama(prompt)
+        return generate_ollama(prompt, max_tokens)
     else:
         print(f"Unknown provider: {provider}, defaulting to anthropic")
-        return generate_anthropic(prompt)
+        return generate_anthropic(prompt, max_tokens)
 
-def generate_anthropic(prompt: str) -> str:
+def generate_anthropic(prompt: str, max_tokens: int = 10) -> str:
     """Generate completion using Anthropic Claude API."""
     headers = {
         "x-api-key": config.ANTHROPIC_API_KEY,
@@ -39,7 +40,7 @@ def generate_anthropic(prompt: str) -> str:
     
     payload = {
         "model": "claude-3-5-sonnet-20241022",
-        "max_tokens": 10,
+        "max_tokens": max_tokens,
         "messages": [
             {"role": "user", "content": prompt}
         ]
@@ -54,7 +55,7 @@ def generate_anthropic(prompt: str) -> str:
         print(f"Anthropic API error: {e}")
         return "0.5"
 
-def generate_groq(prompt: str) -> str:
+def generate_groq(prompt: str, max_tokens: int = 10) -> str:
     """Generate completion using Groq API."""
     headers = {
         "Authorization": f"Bearer {config.GROQ_API_KEY}",
@@ -66,7 +67,7 @@ def generate_groq(prompt: str) -> str:
         "messages": [
             {"role": "user", "content": prompt}
         ],
-        "max_tokens": 10,
+        "max_tokens": max_tokens,
         "temperature": 0.1
     }
     
@@ -79,14 +80,14 @@ def generate_groq(prompt: str) -> str:
         print(f"Groq API error: {e}")
         return "0.5"
 
-def generate_ollama(prompt: str) -> str:
+def generate_ollama(prompt: str, max_tokens: int = 10) -> str:
     """Generate completion using Ollama local API."""
     payload = {
         "model": "llama2",
         "prompt": prompt,
         "stream": False,
         "options": {
-            "num_predict": 10,
+            "num_predict": max_tokens,
             "temperature": 0.1
         }
     }
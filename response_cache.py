@@ -0,0 +1,225 @@
+"""
+Near-duplicate response cache for GET_COUPONS.
+Fingerprints the most recent words of each context with a 64-bit SimHash,
+finds earlier contexts within a Hamming-distance threshold through a banded
+LSH index and confirms them with a token-set Jaccard check, so contexts
+differing only by a greeting or a timestamp share one ranked result.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, FrozenSet, List, Optional
+
+FINGERPRINT_BITS = 64
+# Contexts carry conversation history; only the latest words decide intent
+TAIL_WORDS = 32
+# Numbers keep their separators (10:45, 2026-10-19, 1,299.99) so they can be told apart
+TOKEN_PATTERN = re.compile(r"\d+(?:[:./,-]\d+)*[a-z0-9]*|[a-z0-9]+")
+# Dates, clock times and long digit runs (order numbers, ids) vary between
+# otherwise identical contexts; prices, sizes and model numbers are kept
+NOISE_PATTERN = re.compile(r"\d{1,4}([-/.])\d{1,2}\1\d{1,4}|\d{1,2}:\d{2}(?::\d{2})?(?:am|pm)?|.*\d{6}")
+# Greetings, pleasantries and function words that don't change which coupons fit
+STOP_WORDS = frozenset("""
+    a am an and any are at be can do for hello hey hi i im in is it me my of ok okay
+    on or please pm some thank thanks the there to with you your
+""".split())
+
+
+def tail_words(text: str) -> List[str]:
+    """
+    Return the last TAIL_WORDS content words of text. Punctuation, STOP_WORDS
+    and NOISE_PATTERN tokens are dropped so greetings, timestamps and ids
+    don't count, while "iphone 15" and "iphone 12" stay distinct.
+    """
+    words = [word for word in TOKEN_PATTERN.findall(text.lower())
+             if word not in STOP_WORDS and not NOISE_PATTERN.fullmatch(word)]
+    return words[-TAIL_WORDS:]
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def simhash(text: str) -> Optional[int]:
+    """
+    Compute a 64-bit SimHash over the tail words and word bigrams of text.
+    Returns None when nothing is left to hash.
+    """
+    words = tail_words(text)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return None
+
+    weights = [0] * FINGERPRINT_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of ranked coupon lists keyed by SimHash fingerprint.
+
+    The fingerprint is split into max_distance + 1 bands; by the pigeonhole
+    principle any fingerprint within max_distance bits shares at least one
+    band exactly, so only entries in matching band buckets are compared.
+    A candidate is a hit only if its tail token set also has Jaccard
+    similarity of at least min_jaccard with the lookup's.
+
+    Entries are tagged with the catalog generation they were computed from.
+    Once a newer generation is seen, older entries stop being served as
+    fresh hits but stay available, up to max_stale seconds old, to
+    allow_stale lookups used when the server is shedding load. Writes
+    carrying an older generation than the newest seen are ignored.
+
+    Args:
+        max_distance: Maximum Hamming distance (out of 64 bits) for a candidate
+        min_jaccard: Minimum tail token-set Jaccard similarity for a hit
+        max_entries: Maximum cached contexts before LRU eviction
+        ttl: Seconds an entry stays fresh even if the catalog is unchanged
+        max_stale: Seconds an entry may still be served under overload
+    """
+
+    def __init__(self, max_distance: int = 3, min_jaccard: float = 0.9,
+                 max_entries: int = 10000, ttl: float = 300.0, max_stale: float = 3600.0):
+        self.max_distance = max(0, min(max_distance, FINGERPRINT_BITS - 1))
+        self.min_jaccard = min_jaccard
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_stale = max(ttl, max_stale)
+        self.generation = None
+
+        bands = self.max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self._bands = [(i * width, FINGERPRINT_BITS if i == bands - 1 else (i + 1) * width)
+                       for i in range(bands)]
+        self._entries = OrderedDict()
+        self._buckets = defaultdict(set)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _band_keys(self, fingerprint: int):
+        for i, (start, end) in enumerate(self._bands):
+            yield i, fingerprint >> start & ((1 << (end - start)) - 1)
+
+    def get(self, context: str, generation, allow_stale: bool = False) -> Optional[List[Dict]]:
+        """
+        Return the cached ranking for a near-duplicate context, or None.
+        With allow_stale, entries from older generations or past their TTL
+        (but within max_stale) also count.
+        """
+        fingerprint = simhash(context)
+        tokens = frozenset(tail_words(context))
+        now = time.monotonic()
+
+        with self._lock:
+            self._check_generation(generation)
+            if fingerprint is None:
+                self.misses += 1
+                return None
+
+            candidates = set()
+            for band_key in self._band_keys(fingerprint):
+                candidates |= self._buckets.get(band_key, set())
+
+            # Nearest fingerprints first; the Jaccard check rejects intent changes
+            nearby = []
+            for candidate in candidates:
+                distance = bin(candidate ^ fingerprint).count("1")
+                if distance <= self.max_distance:
+                    nearby.append((distance, candidate))
+
+            for _, candidate in sorted(nearby):
+                entry_generation, created_at, entry_tokens, coupons = self._entries[candidate]
+                age = now - created_at
+                if age > self.max_stale:
+                    self._remove(candidate)
+                    continue
+                fresh = entry_generation == self.generation and age <= self.ttl
+                if not (fresh or allow_stale):
+                    continue
+                if jaccard(tokens, entry_tokens) >= self.min_jaccard:
+                    self._entries.move_to_end(candidate)
+                    self.hits += 1
+                    return coupons
+
+            self.misses += 1
+            return None
+
+    def set(self, context: str, generation, coupons: List[Dict]):
+        """Cache a ranked coupon list computed against the given catalog generation."""
+        if self.max_entries <= 0:
+            return
+        fingerprint = simhash(context)
+        if fingerprint is None:
+            return
+        tokens = frozenset(tail_words(context))
+
+        with self._lock:
+            if not self._check_generation(generation):
+                return
+            if fingerprint in self._entries:
+                self._remove(fingerprint)
+
+            self._entries[fingerprint] = (generation, time.monotonic(), tokens, coupons)
+            for band_key in self._band_keys(fingerprint):
+                self._buckets[band_key].add(fingerprint)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict:
+        """Hit-rate metrics for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+    def _check_generation(self, generation) -> bool:
+        """Advance to a newer generation; returns False if generation is older than the newest seen."""
+        # Caller holds the lock
+        if self.generation is not None and generation < self.generation:
+            return False
+        if generation != self.generation:
+            if self._entries:
+                self.invalidations += 1
+            self.generation = generation
+        return True
+
+    def _remove(self, fingerprint: int):
+        # Caller holds the lock
+        del self._entries[fingerprint]
+        for band_key in self._band_keys(fingerprint):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(fingerprint)
+                if not bucket:
+                    del self._buckets[band_key]
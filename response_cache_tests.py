@@ -0,0 +1,109 @@
+from unittest.mock import patch
+
+from response_cache import ResponseCache, simhash
+
+HISTORY = ("we talked about running shoes for the marathon and a training plan for the "
+           "spring, then about a birthday gift for my sister who likes gardening and "
+           "cooking pasta, and later about a budget laptop with long battery life for "
+           "college classes and some music concert tickets for the weekend")
+
+
+def test_near_duplicate_hit():
+    cache = ResponseCache()
+    cache.set("Hi! Looking for cheap laptop deals for college 2026-10-19 10:01", 0, ["laptop"])
+    assert cache.get("Hello, looking for cheap laptop deals for college 2026-10-19 11:45", 0) == ["laptop"]
+    print("Near-duplicate hit test passed")
+
+
+def test_unrelated_context_misses():
+    cache = ResponseCache()
+    cache.set("Looking for cheap laptop deals for college", 0, ["laptop"])
+    assert cache.get("Want pizza delivery tonight", 0) is None
+    print("Unrelated miss test passed")
+
+
+def test_new_intent_after_history_misses():
+    cache = ResponseCache()
+    cache.set(HISTORY, 0, ["old"])
+    assert cache.get(HISTORY + " Actually now I need a hotel in Denver tonight", 0) is None
+    print("New intent miss test passed")
+
+
+def test_numbers_that_change_intent_miss():
+    cache = ResponseCache()
+    cache.set("Need an iPhone 15 case", 0, ["iphone 15"])
+    cache.set("hotels under $100 a night", 0, ["budget"])
+    assert cache.get("Need an iPhone 12 case", 0) is None
+    assert cache.get("hotels under $900 a night", 0) is None
+    assert cache.get("hi, need an iPhone 15 case 2026-10-19 3:30 pm", 0) == ["iphone 15"]
+    print("Numeric intent miss test passed")
+
+
+def test_context_without_content_words_is_not_cached():
+    cache = ResponseCache()
+    assert simhash("hi there 12:00") is None
+    cache.set("hi", 0, ["x"])
+    assert cache.get("thanks", 0) is None
+    print("Empty fingerprint test passed")
+
+
+def test_generation_invalidation():
+    cache = ResponseCache()
+    cache.set("budget laptop deals", 1, ["laptop"])
+    assert cache.get("budget laptop deals", 2) is None
+    assert cache.stats()["invalidations"] == 1
+
+    # A slow writer holding an older generation must not roll the cache back
+    cache.set("budget laptop deals", 1, ["stale"])
+    assert cache.generation == 2
+    assert cache.get("budget laptop deals", 2) is None
+    print("Generation invalidation test passed")
+
+
+def test_stale_lookup_after_invalidation():
+    cache = ResponseCache(ttl=10, max_stale=100)
+    with patch("response_cache.time.monotonic", return_value=100.0):
+        cache.set("budget laptop deals", 1, ["laptop"])
+    with patch("response_cache.time.monotonic", return_value=150.0):
+        assert cache.get("budget laptop deals", 2) is None
+        assert cache.get("budget laptop deals", 2, allow_stale=True) == ["laptop"]
+    with patch("response_cache.time.monotonic", return_value=201.0):
+        assert cache.get("budget laptop deals", 2, allow_stale=True) is None
+    print("Stale lookup test passed")
+
+
+def test_ttl_expiry():
+    cache = ResponseCache(ttl=10)
+    with patch("response_cache.time.monotonic", return_value=100.0):
+        cache.set("budget laptop deals", 0, ["laptop"])
+    with patch("response_cache.time.monotonic", return_value=111.0):
+        assert cache.get("budget laptop deals", 0) is None
+    print("TTL expiry test passed")
+
+
+def test_lru_eviction_and_stats():
+    cache = ResponseCache(max_entries=2)
+    cache.set("alpha beta", 0, ["a"])
+    cache.set("gamma delta", 0, ["g"])
+    assert cache.get("alpha beta", 0) == ["a"]
+    cache.set("epsilon zeta", 0, ["e"])
+    assert cache.get("gamma delta", 0) is None
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    print("LRU eviction test passed")
+
+
+if __name__ == "__main__":
+    test_near_duplicate_hit()
+    test_unrelated_context_misses()
+    test_new_intent_after_history_misses()
+    test_numbers_that_change_intent_miss()
+    test_context_without_content_words_is_not_cached()
+    test_generation_invalidation()
+    test_stale_lookup_after_invalidation()
+    test_ttl_expiry()
+    test_lru_eviction_and_stats()
+    print("All response cache tests passed")
@@ -4,6 +4,9 @@ Handles all data persistence using AWS S3.
 """
 
 import json
+import threading
+import time
+import uuid
 import boto3
 from typing import Dict, List, Optional
 from botocore.exceptions import ClientError
@@ -24,9 +27,24 @@ class S3Storage:
         self.prefix = config.S3_PREFIX
         self.coupons_prefix = f"{self.prefix}coupons/"
         self.accounts_prefix = f"{self.prefix}accounts/"
+        # Bumped whenever the coupon catalog is known to have changed. Writers
+        # rewrite a shared marker object so other processes notice within
+        # marker_interval seconds.
+        self.catalog_marker_key = f"{self.prefix}catalog_marker.json"
+        self.marker_interval = getattr(config, "CATALOG_MARKER_INTERVAL", 2.0)
+        self.catalog_ttl = getattr(config, "CATALOG_CACHE_TTL", 60.0)
+        self._catalog = None
+        self.catalog_generation = 0
+        self._catalog_signature = None
+        self._marker_etag = None
+        self._marker_checked = float("-inf")
+        self._lock = threading.Lock()
     
-    def save_coupon(self, coupon_id: str, coupon_data: Dict) -> bool:
-        """Save a coupon to S3."""
+    def save_coupon(self, coupon_id: str, coupon_data: Dict, touch: bool = True) -> bool:
+        """
+        Save a coupon to S3. Pass touch=False when saving several coupons and
+        call touch_catalog() once afterwards.
+        """
         try:
             key = f"{self.coupons_prefix}{coupon_id}.json"
             self.s3_client.put_object(
@@ -35,6 +53,8 @@ class S3Storage:
                 Body=json.dumps(coupon_data),
                 ContentType='application/json'
             )
+            if touch:
+                self.touch_catalog()
             return True
         except ClientError as e:
             print(f"Error saving coupon: {e}")
@@ -51,38 +71,126 @@ class S3Storage:
             return None
     
     def get_all_coupons(self) -> List[Dict]:
-        """Retrieve all coupons from S3."""
-        coupons = []
+        """Retrieve all coupons from S3, skipping any that can't be read."""
         try:
-            paginator = self.s3_client.get_paginator('list_objects_v2')
-            pages = paginator.paginate(Bucket=self.bucket, Prefix=self.coupons_prefix)
+            return self._list_coupons(strict=False)
+        except ClientError as e:
+            print(f"Error listing coupons: {e}")
+            return []
+    
+    def _list_coupons(self, strict: bool) -> List[Dict]:
+        """
+        Read every coupon object. Listing errors propagate; with strict an
+        unreadable coupon raises too instead of being skipped.
+        """
+        coupons = []
+        signature = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self.bucket, Prefix=self.coupons_prefix)
+        
+        for page in pages:
+            if 'Contents' not in page:
+                continue
             
-            for page in pages:
-                if 'Contents' not in page:
+            for obj in page['Contents']:
+                if obj['Key'].endswith('/'):
                     continue
                 
-                for obj in page['Contents']:
-                    if obj['Key'].endswith('/'):
-                        continue
-                    
-                    try:
-                        response = self.s3_client.get_object(Bucket=self.bucket, Key=obj['Key'])
-                        data = response['Body'].read().decode('utf-8')
-                        coupons.append(json.loads(data))
-                    except Exception as e:
-                        print(f"Error reading {obj['Key']}: {e}")
-                        continue
-            
-            return coupons
+                signature.append((obj['Key'], obj.get('ETag')))
+                try:
+                    response = self.s3_client.get_object(Bucket=self.bucket, Key=obj['Key'])
+                    data = response['Body'].read().decode('utf-8')
+                    coupons.append(json.loads(data))
+                except Exception as e:
+                    print(f"Error reading {obj['Key']}: {e}")
+                    if strict:
+                        raise
+        
+        # Detect changes made by other writers since the last listing
+        signature = tuple(signature)
+        with self._lock:
+            if self._catalog_signature is not None and signature != self._catalog_signature:
+                self.catalog_generation += 1
+            self._catalog_signature = signature
+        
+        return coupons
+    
+    def get_catalog(self, allow_stale: bool = False) -> List[Dict]:
+        """
+        Return all coupons from an in-memory copy, re-reading S3 only when the
+        catalog generation moved or the copy is older than catalog_ttl.
+        With allow_stale any loaded copy is returned without touching S3.
+        A failed or partial re-read keeps serving the previous copy (or []
+        before the first successful load) and is retried on the next call.
+        """
+        with self._lock:
+            cached = self._catalog
+        if cached is not None and allow_stale:
+            return cached[2]
+        
+        generation = self.current_catalog_generation()
+        if cached is not None and cached[0] == generation \
+                and time.monotonic() - cached[1] < self.catalog_ttl:
+            return cached[2]
+        
+        try:
+            coupons = self._list_coupons(strict=True)
+        except Exception as e:
+            print(f"Error loading coupon catalog: {e}")
+            return cached[2] if cached is not None else []
+        with self._lock:
+            self._catalog = (generation, time.monotonic(), coupons)
+        return coupons
+    
+    def current_catalog_generation(self) -> int:
+        """
+        Return the catalog generation, first checking the shared marker object
+        for writes by other processes (at most once per marker_interval).
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._marker_checked < self.marker_interval:
+                return self.catalog_generation
+            self._marker_checked = now
+        
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket, Key=self.catalog_marker_key)
+            etag = response.get('ETag')
+        except ClientError:
+            etag = None
+        except Exception as e:
+            print(f"Error checking catalog marker: {e}")
+            return self.catalog_generation
+        
+        with self._lock:
+            if etag != self._marker_etag:
+                self._marker_etag = etag
+                self.catalog_generation += 1
+            return self.catalog_generation
+    
+    def touch_catalog(self):
+        """Record a local catalog change and rewrite the shared marker."""
+        with self._lock:
+            self.catalog_generation += 1
+        try:
+            response = self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self.catalog_marker_key,
+                Body=json.dumps({"changed": str(uuid.uuid4()), "timestamp": int(time.time())}),
+                ContentType='application/json'
+            )
+            with self._lock:
+                self._marker_etag = response.get('ETag')
         except ClientError as e:
-            print(f"Error listing coupons: {e}")
-            return []
+            print(f"Error updating catalog marker: {e}")
     
-    def delete_coupon(self, coupon_id: str) -> bool:
-        """Delete a coupon from S3."""
+    def delete_coupon(self, coupon_id: str, touch: bool = True) -> bool:
+        """Delete a coupon from S3; touch works as in save_coupon()."""
         try:
             key = f"{self.coupons_prefix}{coupon_id}.json"
             self.s3_client.delete_object(Bucket=self.bucket, Key=key)
+            if touch:
+                self.touch_catalog()
             return True
         except ClientError as e:
             print(f"Error deleting coupon: {e}")
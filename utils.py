@@ -3,12 +3,16 @@ Utility functions for the Beavis API server.
 """
 
 import json
-import requests
+import threading
 from typing import Dict, List
+from client import CouponClient
 from s3_storage import S3Storage
 
 storage = S3Storage()
 
+_clients = {}
+_clients_lock = threading.Lock()
+
 def auth_req(req: Dict) -> bool:
     """
     Authenticate a request using account credentials.
@@ -59,19 +63,20 @@ def match_coupons(
 ) -> List[Dict]:
     """
     Client function to retrieve coupons from the Beavis API.
+    Thin wrapper around client.CouponClient that reuses one pooled client per
+    credential and returns [] on any error.
     """
-    payload = {
-        "chatbot_id": chatbot_id,
-        "token": token,
-        "context": context[:2000],
-        "N_COUPONS": n_coupons,
-        "GET_IMAGES": get_images
-    }
+    base_url = api_url[:-len("/GET_COUPONS")] if api_url.endswith("/GET_COUPONS") else api_url
+    key = (base_url, chatbot_id, token)
+    
+    with _clients_lock:
+        coupon_client = _clients.get(key)
+        if coupon_client is None:
+            coupon_client = CouponClient(chatbot_id, token, base_url=base_url)
+            _clients[key] = coupon_client
     
     try:
-        response = requests.post(api_url, json=payload, timeout=10)
-        response.raise_for_status()
-        return response.json().get("coupons", [])
+        return coupon_client.match(context, n_coupons=n_coupons, get_images=get_images)
     except Exception as e:
         print(f"API request error: {e}")
         return []